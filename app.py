@@ -1,8 +1,18 @@
-from datetime import datetime, time
-from flask import Flask, jsonify
-import yfinance as yf
+from datetime import datetime
+from contextlib import contextmanager
+from itertools import islice
+from flask import Flask, Response, jsonify, request
+import click
+import csv
+import fcntl
+import io
 import json
+import math
 import os
+import shutil
+import tempfile
+import textwrap
+import time
 from pathlib import Path
 import threading
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -28,24 +38,209 @@ HOLDINGS = {
 # File to store historical data
 DATA_FILE = Path("portfolio_history.json")
 
+# Quote cache shared by all worker processes
+QUOTE_CACHE_FILE = Path("quote_cache.json")
+QUOTE_CACHE_TTL = 60  # seconds
+QUOTE_LOCK_TIMEOUT = 10  # max seconds to wait for another refresh when there is no cache
+
+# Lock files: only the process holding LEADER_LOCK_FILE runs the scheduler
+LEADER_LOCK_FILE = Path("scheduler.lock")
+HISTORY_LOCK_FILE = Path("portfolio_history.lock")
+QUOTE_LOCK_FILE = Path("quote_cache.lock")
+LEADER_RETRY_SECONDS = 60
+
+# A leader elected this long after midnight still writes the missed snapshot
+SNAPSHOT_GRACE_SECONDS = 3600
+
+# Open handle on LEADER_LOCK_FILE while this process is the leader
+_leader_lock = None
+
+# In-process copy of DATA_FILE, keyed on its (mtime, size)
+_history_cache = None
+
+# Bulk export/import of the history
+HISTORY_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+PRICE_FIELDS = list(TICKERS) + ["Fondsen"]
+HISTORY_FIELDS = ["date", "timestamp", "total"] + PRICE_FIELDS
+EXPORT_CHUNK_SIZE = 64 * 1024  # bytes per streamed chunk
+EXPORT_BATCH_SIZE = 1000  # rows per Parquet row group
+IMPORT_BATCH_SIZE = 1000  # entries merged into the history file at once
+MAX_IMPORT_ERRORS = 20
+
 def get_last_close(symbol: str) -> float:
+    # Imported here: yfinance pulls in pandas/numpy, which slows down startup
+    import yfinance as yf
     ticker = yf.Ticker(symbol)
     data = ticker.history(period="1d")
     if data.empty:
         raise RuntimeError(f"Geen data voor {symbol}")
     return float(data["Close"].iloc[0])
 
+def empty_prices():
+    """Prices with every ticker unknown, used when no quotes are available"""
+    prices = {name: None for name in TICKERS}
+
+    # Add fondsen
+    prices["Fondsen"] = 3552
+
+    return prices
+
+def fetch_prices():
+    """Fetch the latest prices for all tickers"""
+    prices = empty_prices()
+    for name, symbol in TICKERS.items():
+        try:
+            prices[name] = get_last_close(symbol)
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
+
+    return prices
+
+@contextmanager
+def file_lock(path, timeout=None):
+    """Hold an exclusive lock on path, shared across worker processes.
+
+    With a timeout, raise TimeoutError if the lock is not free within that
+    many seconds (0 means a single non-blocking attempt).
+    """
+    with open(path, 'a') as f:
+        if timeout is None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"{path} is locked")
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def atomic_write(path):
+    """Open a unique temp file next to path and rename it over path on success"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def write_json_atomic(path, data, **kwargs):
+    """Write JSON to a temp file and rename it, so readers never see a partial file"""
+    with atomic_write(path) as f:
+        json.dump(data, f, **kwargs)
+
+def load_quote_cache():
+    """Load the shared quote cache, or None if missing or unreadable"""
+    try:
+        with open(QUOTE_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def refresh_quote_cache():
+    """Fetch fresh prices and store them in the shared quote cache"""
+    prices = fetch_prices()
+    write_json_atomic(QUOTE_CACHE_FILE, {"fetched_at": time.time(), "prices": prices})
+    return prices
+
+def poll_quotes():
+    """Scheduler job: refresh the quote cache unless a request is already doing so"""
+    try:
+        with file_lock(QUOTE_LOCK_FILE, timeout=0):
+            refresh_quote_cache()
+    except TimeoutError:
+        pass
+
+def get_cached_prices():
+    """Return prices from the shared cache, refreshing it when stale"""
+    cache = load_quote_cache()
+    if cache and time.time() - cache.get("fetched_at", 0) < QUOTE_CACHE_TTL:
+        return cache["prices"]
+
+    # Only one worker refetches. The others serve the stale prices if there
+    # are any, and otherwise wait a bounded time for its result.
+    try:
+        with file_lock(QUOTE_LOCK_FILE, timeout=0 if cache else QUOTE_LOCK_TIMEOUT):
+            cache = load_quote_cache()
+            if cache and time.time() - cache.get("fetched_at", 0) < QUOTE_CACHE_TTL:
+                return cache["prices"]
+            return refresh_quote_cache()
+    except TimeoutError:
+        # Never fetch here: on a cold boot every worker would hit yfinance
+        cache = cache or load_quote_cache()
+        if cache:
+            return cache["prices"]
+        return empty_prices()
+
 def load_history():
-    """Load historical portfolio data from JSON file"""
-    if DATA_FILE.exists():
+    """Load historical portfolio data from JSON file
+
+    The returned list is cached and shared between callers; do not mutate it.
+    """
+    global _history_cache
+    try:
+        stat = DATA_FILE.stat()
+    except FileNotFoundError:
+        return []
+
+    # Reuse the parsed file until another process replaces it; atomic writes
+    # always create a new inode, so the key changes even with coarse mtimes
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _history_cache is None or _history_cache[0] != key:
         with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    return []
+            _history_cache = (key, json.load(f))
+    return _history_cache[1]
 
 def save_history(history):
     """Save historical portfolio data to JSON file"""
-    with open(DATA_FILE, 'w') as f:
-        json.dump(history, f, indent=2)
+    write_json_atomic(DATA_FILE, history, indent=2)
+
+def iter_history(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield history entries one at a time without loading the whole file"""
+    decoder = json.JSONDecoder()
+    try:
+        f = open(DATA_FILE, 'r')
+    except FileNotFoundError:
+        return
+
+    with f:
+        buf = f.read(chunk_size)
+        pos = 0
+        while True:
+            # Skip the opening bracket, separators and whitespace between entries
+            while pos < len(buf) and buf[pos] in "[, \t\r\n":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            if pos < len(buf):
+                try:
+                    entry, pos = decoder.raw_decode(buf, pos)
+                    yield entry
+                    continue
+                except json.JSONDecodeError:
+                    # Entry is cut off at the end of the buffer; read more
+                    pass
+
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if pos < len(buf):
+                    raise ValueError(f"Corrupt history file {DATA_FILE}")
+                return
+            buf = buf[pos:] + chunk
+            pos = 0
 
 def calculate_portfolio_total(prices):
     """Calculate total portfolio value"""
@@ -72,23 +267,11 @@ def save_daily_snapshot():
     
     try:
         # Get current prices
-        prices = {}
-        for name, symbol in TICKERS.items():
-            try:
-                prices[name] = get_last_close(symbol)
-            except Exception as e:
-                print(f"Error fetching {name}: {e}")
-                prices[name] = None
-        
-        # Add fondsen
-        prices["Fondsen"] = 3552
+        prices = fetch_prices()
         
         # Calculate total
         total = calculate_portfolio_total(prices)
         
-        # Load existing history
-        history = load_history()
-        
         # Add new entry
         snapshot = {
             "date": datetime.now().strftime("%Y-%m-%d"),
@@ -97,17 +280,270 @@ def save_daily_snapshot():
             "prices": prices
         }
         
-        # Avoid duplicate entries for the same date
-        history = [h for h in history if h.get("date") != snapshot["date"]]
-        history.append(snapshot)
-        
-        # Save to file
-        save_history(history)
+        # Read-modify-write under a lock so concurrent workers don't lose entries
+        with file_lock(HISTORY_LOCK_FILE):
+            history = load_history()
+            
+            # Avoid duplicate entries for the same date
+            history = [h for h in history if h.get("date") != snapshot["date"]]
+            history.append(snapshot)
+            
+            # Save to file
+            save_history(history)
         print(f"Snapshot saved: €{total:.2f}")
         
     except Exception as e:
         print(f"Error saving snapshot: {e}")
 
+def _batched(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def _require_pyarrow():
+    """Import pyarrow, which is only needed for Parquet"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support requires pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+def _format_from_path(path):
+    """Guess the history format from a file name, defaulting to NDJSON"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    return "ndjson"
+
+def _row_from_entry(entry):
+    """Flatten a history entry into a CSV/Parquet row"""
+    prices = entry.get("prices") or {}
+    row = {
+        "date": entry.get("date"),
+        "timestamp": entry.get("timestamp"),
+        "total": entry.get("total"),
+    }
+    for name in PRICE_FIELDS:
+        row[name] = prices.get(name)
+    return row
+
+def _entry_from_row(row):
+    """Turn a flat CSV/Parquet row back into a history entry"""
+    return {
+        "date": row.get("date"),
+        "timestamp": row.get("timestamp"),
+        "total": row.get("total"),
+        "prices": {k: v for k, v in row.items() if k not in ("date", "timestamp", "total")},
+    }
+
+def _to_float(value):
+    """Convert an imported number to float; empty values become None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"invalid number {value!r}")
+    number = float(value)
+    # NaN/Infinity would end up as invalid JSON in /api/history and /api/prices
+    if not math.isfinite(number):
+        raise ValueError(f"invalid number {value!r}")
+    return number
+
+def validate_history_entry(entry):
+    """Validate an imported entry and return it in the format of save_daily_snapshot"""
+    if not isinstance(entry, dict):
+        raise ValueError("entry is not an object")
+
+    # Store normalized values: dates are matched and sorted as strings
+    date = entry.get("date")
+    try:
+        date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid date {date!r}")
+
+    timestamp = entry.get("timestamp") or f"{date} 00:00:00"
+    try:
+        timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid timestamp {timestamp!r}")
+
+    try:
+        total = _to_float(entry.get("total"))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid total {entry.get('total')!r}")
+    if total is None:
+        raise ValueError("missing total")
+
+    prices = entry.get("prices") or {}
+    if not isinstance(prices, dict):
+        raise ValueError("prices is not an object")
+    try:
+        prices = {name: _to_float(value) for name, value in prices.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid prices {prices!r}")
+
+    return {
+        "date": date,
+        "timestamp": timestamp,
+        "total": round(total, 2),
+        "prices": prices,
+    }
+
+def iter_history_ndjson():
+    """Stream the history as NDJSON, one entry per line"""
+    buf = io.StringIO()
+    for entry in iter_history():
+        buf.write(json.dumps(entry) + "\n")
+        if buf.tell() >= EXPORT_CHUNK_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def iter_history_csv():
+    """Stream the history as CSV with one column per price"""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=HISTORY_FIELDS)
+    writer.writeheader()
+    for entry in iter_history():
+        writer.writerow(_row_from_entry(entry))
+        if buf.tell() >= EXPORT_CHUNK_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def write_history_parquet(f, batch_size=EXPORT_BATCH_SIZE):
+    """Write the history to a binary file as Parquet, one row group per batch"""
+    pa, pq = _require_pyarrow()
+    schema = pa.schema(
+        [("date", pa.string()), ("timestamp", pa.string()), ("total", pa.float64())]
+        + [(name, pa.float64()) for name in PRICE_FIELDS]
+    )
+    with pq.ParquetWriter(f, schema) as writer:
+        for rows in _batched(map(_row_from_entry, iter_history()), batch_size):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+def iter_history_parquet():
+    """Stream the history as Parquet, spooled through a temp file for the footer"""
+    with tempfile.TemporaryFile() as f:
+        write_history_parquet(f)
+        f.seek(0)
+        while chunk := f.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+def _spool(stream):
+    """Copy a read()-only stream into a real temp file, in constant memory"""
+    spooled = tempfile.TemporaryFile()
+    shutil.copyfileobj(stream, spooled)
+    spooled.seek(0)
+    return spooled
+
+def read_history_records(stream, fmt):
+    """Return (records, parse) for a binary stream; parse turns a record into an entry"""
+    if fmt in ("ndjson", "csv") and not isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        # TextIOWrapper needs the full io interface, which e.g. upload streams
+        # (SpooledTemporaryFile before Python 3.11) and raw WSGI input lack
+        stream = _spool(stream)
+    if fmt == "ndjson":
+        text = io.TextIOWrapper(stream, encoding="utf-8")
+        return (line for line in text if line.strip()), json.loads
+    if fmt == "csv":
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        return csv.DictReader(text), _entry_from_row
+    if fmt == "parquet":
+        pa, pq = _require_pyarrow()
+        seekable = getattr(stream, "seekable", None)
+        if not (seekable and seekable()):
+            # Parquet keeps its metadata at the end, so spool to disk first
+            stream = _spool(stream)
+        parquet = pq.ParquetFile(stream)
+        records = (
+            row
+            for batch in parquet.iter_batches(batch_size=IMPORT_BATCH_SIZE)
+            for row in batch.to_pylist()
+        )
+        return records, _entry_from_row
+    raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(HISTORY_FORMATS)}")
+
+def merge_history_batch(batch):
+    """Upsert a {date: entry} batch into the history file, keeping it sorted by date"""
+    new_entries = sorted(batch.values(), key=lambda e: e["date"])
+
+    with file_lock(HISTORY_LOCK_FILE):
+        with atomic_write(DATA_FILE) as f:
+            written = 0
+
+            # Same layout as json.dump(history, f, indent=2)
+            def write(entry):
+                nonlocal written
+                f.write(",\n" if written else "[\n")
+                f.write(textwrap.indent(json.dumps(entry, indent=2), "  "))
+                written += 1
+
+            i = 0
+            for entry in iter_history():
+                date = entry.get("date")
+                if date in batch:
+                    continue
+                while i < len(new_entries) and date is not None and new_entries[i]["date"] < date:
+                    write(new_entries[i])
+                    i += 1
+                write(entry)
+            for entry in new_entries[i:]:
+                write(entry)
+
+            f.write("\n]" if written else "[]")
+
+def import_history_stream(stream, fmt, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and upsert history entries from a binary stream in batches
+
+    Batches are committed as they fill up. If the stream itself breaks
+    partway (bad encoding, malformed CSV/Parquet), the valid records read so
+    far are still committed and result["error"] says where it stopped.
+    """
+    records, parse = read_history_records(stream, fmt)
+    records = iter(records)
+    result = {"imported": 0, "skipped": 0, "errors": [], "error": None}
+    batch = {}
+    number = 0
+
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error, OSError) as e:
+            result["error"] = f"record {number + 1}: {e}"
+            break
+        number += 1
+
+        try:
+            entry = validate_history_entry(parse(record))
+        except ValueError as e:
+            result["skipped"] += 1
+            if len(result["errors"]) < MAX_IMPORT_ERRORS:
+                result["errors"].append(f"record {number}: {e}")
+            continue
+
+        # Later records for the same date win
+        batch[entry["date"]] = entry
+        if len(batch) >= batch_size:
+            merge_history_batch(batch)
+            result["imported"] += len(batch)
+            batch = {}
+
+    if batch:
+        merge_history_batch(batch)
+        result["imported"] += len(batch)
+
+    return result
+
 @app.route("/")
 def index():
     html = """<!DOCTYPE html>
@@ -629,15 +1065,7 @@ def index():
 def api_prices():
     now = datetime.now()
 
-    prices = {}
-    for name, symbol in TICKERS.items():
-        try:
-            prices[name] = get_last_close(symbol)
-        except Exception:
-            prices[name] = None
-
-    # Add fondsen
-    prices["Fondsen"] = 3552
+    prices = get_cached_prices()
     
     # Calculate current total
     current_total = calculate_portfolio_total(prices)
@@ -672,14 +1100,120 @@ def api_history():
     history = load_history()
     return jsonify(history)
 
+@app.route("/api/history/export")
+def api_history_export():
+    """Stream the full history as CSV, NDJSON or Parquet"""
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in HISTORY_FORMATS:
+        return jsonify({"status": "error", "message": f"Unknown format {fmt!r}"}), 400
+
+    if fmt == "parquet":
+        try:
+            _require_pyarrow()
+        except RuntimeError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        chunks = iter_history_parquet()
+    elif fmt == "csv":
+        chunks = iter_history_csv()
+    else:
+        chunks = iter_history_ndjson()
+
+    return Response(
+        chunks,
+        mimetype=HISTORY_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=portfolio_history.{fmt}"},
+    )
+
+@app.route("/api/history/import", methods=["POST"])
+def api_history_import():
+    """Upsert history entries by date from an uploaded file or the request body"""
+    fmt = request.args.get("format", "ndjson")
+
+    # Only touch request.files for multipart uploads: for any other form
+    # content type werkzeug would consume the body and leave the stream empty
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("file")
+        if upload is None:
+            return jsonify({"status": "error", "message": "Missing 'file' upload"}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+
+    try:
+        result = import_history_stream(stream, fmt)
+    except (ValueError, RuntimeError, csv.Error, OSError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if result["error"]:
+        # Earlier batches are already saved; tell the caller how far it got
+        message = f"Import stopped at {result['error']} after importing {result['imported']} entries"
+        return jsonify({"status": "error", "message": message, **result}), 400
+
+    return jsonify({"status": "success", **result})
+
 @app.route("/api/snapshot", methods=["POST"])
 def manual_snapshot():
     """Manually trigger a snapshot (for testing)"""
     save_daily_snapshot()
     return jsonify({"status": "success", "message": "Snapshot saved!"})
 
+def warm_caches():
+    """Prefill the quote and history caches so the first request is fast"""
+    started = time.perf_counter()
+    try:
+        load_history()
+        get_cached_prices()
+        print(f"[pid {os.getpid()}] Caches warmed in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Error warming caches: {e}")
+
+def start_cache_warmup():
+    """Warm the caches in a background thread after boot"""
+    thread = threading.Thread(target=warm_caches, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def catch_up_daily_snapshot(now=None):
+    """Write today's snapshot if a new leader took over just after midnight"""
+    now = now or datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if (now - midnight).total_seconds() > SNAPSHOT_GRACE_SECONDS:
+        return False
+
+    today = now.strftime("%Y-%m-%d")
+    if any(h.get("date") == today for h in load_history()):
+        return False
+
+    save_daily_snapshot()
+    return True
+
+def try_become_leader():
+    """Try to take the leader lock; the leader is the only process running jobs"""
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+
+    f = open(LEADER_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+
+    # Keep the handle open: the lock is released when this process exits
+    _leader_lock = f
+    return True
+
 def start_scheduler():
     """Start the background scheduler for daily snapshots"""
+    if not try_become_leader():
+        # Another worker is the leader; take over if it ever goes away
+        print(f"[pid {os.getpid()}] Scheduler runs in another process - standing by")
+        retry = threading.Timer(LEADER_RETRY_SECONDS, start_scheduler)
+        retry.daemon = True
+        retry.start()
+        return
+
     scheduler = BackgroundScheduler()
     
     # Schedule daily snapshot at midnight
@@ -688,15 +1222,72 @@ def start_scheduler():
         'cron',
         hour=0,
         minute=0,
-        id='daily_snapshot'
+        id='daily_snapshot',
+        misfire_grace_time=SNAPSHOT_GRACE_SECONDS,
+        coalesce=True
+    )
+    
+    # The previous leader may have gone away around midnight
+    scheduler.add_job(catch_up_daily_snapshot, id='snapshot_catch_up')
+    
+    # Keep the shared quote cache warm for all workers; poll faster than the
+    # TTL so requests rarely find it stale
+    scheduler.add_job(
+        poll_quotes,
+        'interval',
+        seconds=QUOTE_CACHE_TTL / 2,
+        id='quote_poller'
     )
     
     scheduler.start()
-    print("Scheduler started - daily snapshots will be saved at midnight")
+    print(f"[pid {os.getpid()}] Scheduler started - daily snapshots will be saved at midnight")
+
+@app.cli.command("export-history")
+@click.argument("output", type=click.Path(dir_okay=False), default="-")
+@click.option("--format", "fmt", type=click.Choice(list(HISTORY_FORMATS)),
+              help="Defaults to the OUTPUT extension, or ndjson.")
+def export_history_command(output, fmt):
+    """Stream the portfolio history to OUTPUT (default: stdout)."""
+    fmt = fmt or _format_from_path(output)
+    try:
+        # Check before opening, so a failed export doesn't leave an empty file
+        if fmt == "parquet":
+            _require_pyarrow()
+        with click.open_file(output, 'wb') as f:
+            if fmt == "parquet":
+                write_history_parquet(f)
+            else:
+                chunks = iter_history_csv() if fmt == "csv" else iter_history_ndjson()
+                for chunk in chunks:
+                    f.write(chunk.encode("utf-8"))
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+@app.cli.command("import-history")
+@click.argument("source", type=click.File('rb'), default="-")
+@click.option("--format", "fmt", type=click.Choice(list(HISTORY_FORMATS)),
+              help="Defaults to the SOURCE extension, or ndjson.")
+@click.option("--batch-size", type=click.IntRange(min=1), default=IMPORT_BATCH_SIZE, show_default=True,
+              help="Entries merged into the history file at once.")
+def import_history_command(source, fmt, batch_size):
+    """Validate and upsert history entries by date from SOURCE (default: stdin)."""
+    fmt = fmt or _format_from_path(source.name)
+    try:
+        result = import_history_stream(source, fmt, batch_size)
+    except (ValueError, RuntimeError, csv.Error) as e:
+        raise click.ClickException(str(e))
+
+    for error in result["errors"]:
+        click.echo(error, err=True)
+    click.echo(f"Imported {result['imported']} entries, skipped {result['skipped']}")
+    if result["error"]:
+        raise click.ClickException(f"Import stopped at {result['error']}")
 
 if __name__ == "__main__":
+    # Development server; in production use: gunicorn -c gunicorn.conf.py app:app
     # Start the scheduler
     start_scheduler()
+    start_cache_warmup()
     
     # Run the Flask app
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""Measure cold-start time of the tracker
+
+Each measurement runs in a fresh interpreter so nothing is cached in-process.
+
+    python benchmarks/startup.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "import app (lazy)": "import app",
+    "import app + yfinance (old eager cost)": "import app; import yfinance",
+}
+
+def measure(code, runs):
+    """Return wall-clock seconds for running code in fresh interpreters"""
+    timer = (
+        "import time; _t = time.perf_counter(); "
+        f"{code}; "
+        "print(time.perf_counter() - _t)"
+    )
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", timer],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            lines = out.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"exit code {out.returncode}")
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in CASES.items():
+        try:
+            timings = measure(code, runs)
+        except RuntimeError as e:
+            print(f"{name:<40} failed: {e}")
+            continue
+        print(f"{name:<40} median {statistics.median(timings) * 1000:8.1f} ms"
+              f"  min {min(timings) * 1000:8.1f} ms  ({runs} runs)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Gunicorn settings for running the tracker in production"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Scale with the number of cores; override with WEB_CONCURRENCY
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "2"))
+timeout = 60
+
+def post_worker_init(worker):
+    """Every worker tries to become the scheduler leader; only one wins"""
+    from app import start_cache_warmup, start_scheduler
+    start_scheduler()
+    start_cache_warmup()
@@ -0,0 +1,388 @@
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def history_file(tmp_path, monkeypatch):
+    """Point the history file and its lock at a temp directory"""
+    monkeypatch.setattr(app, "DATA_FILE", tmp_path / "portfolio_history.json")
+    monkeypatch.setattr(app, "HISTORY_LOCK_FILE", tmp_path / "portfolio_history.lock")
+    monkeypatch.setattr(app, "_history_cache", None)
+    return app.DATA_FILE
+
+
+def entry(date, total, **prices):
+    return {"date": date, "timestamp": f"{date} 00:00:00", "total": total, "prices": prices}
+
+
+def import_ndjson(*records, **kwargs):
+    body = "".join(r if isinstance(r, str) else json.dumps(r) + "\n" for r in records)
+    return app.import_history_stream(io.BytesIO(body.encode("utf-8")), "ndjson", **kwargs)
+
+
+def stored():
+    with open(app.DATA_FILE) as f:
+        return json.load(f)
+
+
+# iter_history
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 65536])
+def test_iter_history_across_chunk_boundaries(chunk_size):
+    # Strings containing brackets, commas, escapes and non-ASCII text must
+    # survive being split at any position
+    history = [
+        entry("2024-01-01", 101.5, SEME=1.5, BTC=None),
+        {"date": "2024-01-02", "note": "a ], [ \"quoted\" \\ € {x}", "total": 2},
+        entry("2024-01-03", 103, Fondsen=3552),
+    ]
+    app.save_history(history)
+
+    assert list(app.iter_history(chunk_size=chunk_size)) == history
+
+
+@pytest.mark.parametrize("content", ["", "[]", "[\n]", "  [ ]  \n"])
+def test_iter_history_empty_files(content):
+    app.DATA_FILE.write_text(content)
+
+    assert list(app.iter_history(chunk_size=1)) == []
+
+
+def test_iter_history_missing_file():
+    assert list(app.iter_history()) == []
+
+
+def test_iter_history_truncated_file_raises():
+    app.DATA_FILE.write_text('[\n  {"date": "2024-01-01", "total": 1')
+
+    with pytest.raises(ValueError):
+        list(app.iter_history(chunk_size=4))
+
+
+# merge_history_batch / import
+
+def test_merge_keeps_save_history_layout():
+    app.save_history([entry("2024-01-01", 1.0), entry("2024-01-02", 2.0)])
+    before = app.DATA_FILE.read_text()
+
+    app.merge_history_batch({})
+
+    assert app.DATA_FILE.read_text() == before
+
+
+def test_merge_into_missing_file():
+    app.merge_history_batch({"2024-01-01": entry("2024-01-01", 1.0)})
+
+    assert stored() == [entry("2024-01-01", 1.0)]
+
+
+def test_upsert_replaces_existing_date():
+    app.save_history([entry("2024-01-01", 1.0), entry("2024-01-03", 3.0, SEME=1.0)])
+
+    result = import_ndjson(entry("2024-01-03", 30.0, SEME=2.0))
+
+    assert result == {"imported": 1, "skipped": 0, "errors": [], "error": None}
+    assert stored() == [entry("2024-01-01", 1.0), entry("2024-01-03", 30.0, SEME=2.0)]
+
+
+def test_merge_keeps_history_sorted_by_date():
+    app.save_history([entry("2024-01-02", 2.0), entry("2024-01-05", 5.0)])
+
+    import_ndjson(
+        entry("2024-01-06", 6.0),
+        entry("2024-01-01", 1.0),
+        entry("2024-01-03", 3.0),
+        entry("2024-01-04", 4.0),
+        batch_size=2,
+    )
+
+    assert [h["date"] for h in stored()] == [f"2024-01-0{d}" for d in range(1, 7)]
+
+
+def test_later_records_for_same_date_win():
+    import_ndjson(entry("2024-01-01", 1.0), entry("2024-01-01", 2.0), batch_size=1)
+
+    assert [h["total"] for h in stored()] == [2.0]
+
+
+def test_dates_and_timestamps_are_normalized():
+    app.save_history([entry("2024-01-03", 3.0), entry("2024-01-05", 5.0)])
+
+    import_ndjson({"date": "2024-1-3", "timestamp": "2024-1-3 9:05:00", "total": 30})
+
+    assert stored() == [
+        {"date": "2024-01-03", "timestamp": "2024-01-03 09:05:00", "total": 30.0, "prices": {}},
+        entry("2024-01-05", 5.0),
+    ]
+
+
+def test_rejected_records_are_reported():
+    app.save_history([entry("2024-01-01", 1.0)])
+
+    result = import_ndjson(
+        "not json\n",
+        "\n",
+        '["a list"]\n',
+        '{"date": "2024-13-01", "total": 1}\n',
+        '{"date": "2024-01-02"}\n',
+        '{"date": "2024-01-03", "total": "NaN"}\n',
+        '{"date": "2024-01-04", "total": 1, "prices": {"BTC": "inf"}}\n',
+        '{"date": "2024-01-05", "total": true}\n',
+        '{"date": "2024-01-06", "timestamp": "yesterday", "total": 1}\n',
+        '{"date": "2024-01-07", "total": 7}\n',
+    )
+
+    assert result["imported"] == 1
+    assert result["skipped"] == 8
+    assert result["errors"][0].startswith("record 1: Expecting value")
+    assert result["errors"][1:] == [
+        "record 2: entry is not an object",
+        "record 3: invalid date '2024-13-01'",
+        "record 4: missing total",
+        "record 5: invalid total 'NaN'",
+        "record 6: invalid prices {'BTC': 'inf'}",
+        "record 7: invalid total True",
+        "record 8: invalid timestamp 'yesterday'",
+    ]
+    assert [h["date"] for h in stored()] == ["2024-01-01", "2024-01-07"]
+
+
+def test_csv_round_trip():
+    history = [entry("2024-01-01", 1.5, SEME=1.25, BTC=None), entry("2024-01-02", 2.0, Fondsen=3552.0)]
+    app.save_history(history)
+    exported = "".join(app.iter_history_csv())
+    app.DATA_FILE.unlink()
+
+    result = app.import_history_stream(io.BytesIO(exported.encode("utf-8")), "csv")
+
+    assert result["imported"] == 2
+    expected_prices = [
+        {name: None for name in app.PRICE_FIELDS} | {"SEME": 1.25},
+        {name: None for name in app.PRICE_FIELDS} | {"Fondsen": 3552.0},
+    ]
+    assert [h["prices"] for h in stored()] == expected_prices
+    assert [(h["date"], h["timestamp"], h["total"]) for h in stored()] == [
+        (h["date"], h["timestamp"], h["total"]) for h in history
+    ]
+
+
+def test_ndjson_round_trip():
+    history = [entry("2024-01-01", 1.5, SEME=1.25, BTC=None), entry("2024-01-02", 2.0)]
+    app.save_history(history)
+    exported = "".join(app.iter_history_ndjson())
+    app.DATA_FILE.unlink()
+
+    result = app.import_history_stream(io.BytesIO(exported.encode("utf-8")), "ndjson")
+
+    assert result["imported"] == 2
+    assert stored() == history
+
+
+def test_import_stream_commits_records_before_stream_error():
+    body = "".join(json.dumps(entry(f"2024-01-{d:02d}", 1.0)) + "\n" for d in range(1, 29))
+    # Pad past TextIOWrapper's read size so the bad byte is decoded later
+    body += "\n" * 10000
+
+    result = app.import_history_stream(io.BytesIO(body.encode("utf-8") + b"\xff\n"), "ndjson", batch_size=5)
+
+    assert result["imported"] == 28
+    assert result["error"].startswith("record 29:")
+    assert "codec can't decode" in result["error"]
+    assert len(stored()) == 28
+
+
+# HTTP endpoints
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_import_endpoint_reads_form_encoded_body(client):
+    # curl --data-binary defaults to application/x-www-form-urlencoded
+    body = json.dumps(entry("2024-01-01", 1.0)) + "\n"
+
+    response = client.post(
+        "/api/history/import?format=ndjson",
+        data=body,
+        content_type="application/x-www-form-urlencoded",
+    )
+
+    assert response.get_json()["imported"] == 1
+    assert stored() == [entry("2024-01-01", 1.0)]
+
+
+def test_import_endpoint_multipart_csv(client):
+    csv_body = "date,total,SEME\n2024-01-01,1.5,2\n"
+
+    response = client.post(
+        "/api/history/import?format=csv",
+        data={"file": (io.BytesIO(csv_body.encode("utf-8")), "history.csv")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 1
+    assert stored()[0]["prices"] == {"SEME": 2.0}
+
+
+def test_import_endpoint_rejects_undecodable_body(client):
+    response = client.post(
+        "/api/history/import?format=ndjson",
+        data=b"\xff\xfe\xfa\n",
+        content_type="application/x-ndjson",
+    )
+
+    assert response.status_code == 400
+
+
+def test_export_endpoint_streams_csv(client):
+    app.save_history([entry("2024-01-01", 1.0)])
+
+    response = client.get("/api/history/export?format=csv")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == ",".join(app.HISTORY_FIELDS)
+    assert lines[1].startswith("2024-01-01,2024-01-01 00:00:00,1.0,")
+
+
+def test_endpoint_reports_partial_import_when_stream_breaks(client):
+    # The decode error surfaces only after the first batch was committed
+    start = date(2020, 1, 1)
+    body = "".join(
+        json.dumps(entry((start + timedelta(days=i)).isoformat(), 1.0)) + "\n"
+        for i in range(1500)
+    ).encode("utf-8") + b"\xff\n"
+
+    response = client.post(
+        "/api/history/import?format=ndjson",
+        data=body,
+        content_type="application/x-ndjson",
+    )
+
+    assert response.status_code == 400
+    result = response.get_json()
+    assert result["status"] == "error"
+    assert result["imported"] >= app.IMPORT_BATCH_SIZE
+    assert result["error"].startswith(f"record {result['imported'] + 1}:")
+    assert f"after importing {result['imported']} entries" in result["message"]
+    assert len(stored()) == result["imported"]
+
+
+# CLI
+
+@pytest.fixture
+def runner():
+    return app.app.test_cli_runner()
+
+
+def test_cli_ndjson_round_trip(runner, tmp_path):
+    history = [entry("2024-01-01", 1.5, SEME=1.25), entry("2024-01-02", 2.0)]
+    app.save_history(history)
+    path = tmp_path / "export.ndjson"
+
+    result = runner.invoke(args=["export-history", str(path)])
+    assert result.exit_code == 0, result.output
+    app.DATA_FILE.unlink()
+
+    result = runner.invoke(args=["import-history", str(path), "--batch-size", "1"])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 entries, skipped 0" in result.output
+    assert stored() == history
+
+
+def test_cli_export_csv_to_stdout(runner):
+    app.save_history([entry("2024-01-01", 1.0)])
+
+    result = runner.invoke(args=["export-history", "--format", "csv"])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0] == ",".join(app.HISTORY_FIELDS)
+
+
+def test_cli_import_reports_rejected_and_partial(runner, tmp_path):
+    path = tmp_path / "broken.ndjson"
+    path.write_bytes(
+        json.dumps(entry("2024-01-01", 1.0)).encode("utf-8") + b'\n{"date": "bad"}\n'
+        + b"\n" * 10000 + b"\xff\n"
+    )
+
+    result = runner.invoke(args=["import-history", str(path)])
+
+    assert result.exit_code == 1
+    assert "record 2: invalid date 'bad'" in result.output
+    assert "Imported 1 entries, skipped 1" in result.output
+    assert "Import stopped at record 3:" in result.output
+    assert stored() == [entry("2024-01-01", 1.0)]
+
+
+@pytest.mark.parametrize("batch_size", ["0", "-1"])
+def test_cli_import_rejects_non_positive_batch_size(runner, tmp_path, batch_size):
+    path = tmp_path / "history.ndjson"
+    path.write_text(json.dumps(entry("2024-01-01", 1.0)) + "\n")
+
+    result = runner.invoke(args=["import-history", str(path), "--batch-size", batch_size])
+
+    assert result.exit_code == 2
+    assert not app.DATA_FILE.exists()
+
+
+def test_cli_parquet_export_without_pyarrow_leaves_no_file(runner, tmp_path, monkeypatch):
+    def missing():
+        raise RuntimeError("Parquet support requires pyarrow (pip install pyarrow)")
+
+    monkeypatch.setattr(app, "_require_pyarrow", missing)
+    app.save_history([entry("2024-01-01", 1.0)])
+    path = tmp_path / "out.parquet"
+
+    result = runner.invoke(args=["export-history", str(path)])
+
+    assert result.exit_code == 1
+    assert "requires pyarrow" in result.output
+    assert not path.exists()
+
+
+def test_parquet_round_trip(runner, tmp_path):
+    pytest.importorskip("pyarrow")
+    history = [entry("2024-01-01", 1.5, SEME=1.25, BTC=None), entry("2024-01-02", 2.0, Fondsen=3552.0)]
+    app.save_history(history)
+    path = tmp_path / "history.parquet"
+
+    result = runner.invoke(args=["export-history", str(path)])
+    assert result.exit_code == 0, result.output
+    app.DATA_FILE.unlink()
+
+    result = runner.invoke(args=["import-history", str(path)])
+
+    assert result.exit_code == 0, result.output
+    expected = [
+        h | {"prices": {name: None for name in app.PRICE_FIELDS} | h["prices"]}
+        for h in history
+    ]
+    assert stored() == expected
+
+
+def test_parquet_export_endpoint_round_trip(client):
+    pytest.importorskip("pyarrow")
+    app.save_history([entry("2024-01-01", 1.5, SEME=1.25)])
+
+    exported = client.get("/api/history/export?format=parquet")
+    assert exported.status_code == 200
+    app.DATA_FILE.unlink()
+
+    response = client.post(
+        "/api/history/import?format=parquet",
+        data={"file": (io.BytesIO(exported.data), "history.parquet")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.get_json()["imported"] == 1
+    assert stored()[0]["prices"]["SEME"] == 1.25
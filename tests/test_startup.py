@@ -0,0 +1,62 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import app
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_app_does_not_load_heavy_modules():
+    script = (
+        "import sys\n"
+        "import app\n"
+        "print([m for m in ('yfinance', 'pandas', 'numpy') if m in sys.modules])\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    assert out.stdout.strip() == "[]"
+
+
+@pytest.fixture
+def history_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DATA_FILE", tmp_path / "portfolio_history.json")
+    monkeypatch.setattr(app, "_history_cache", None)
+    app.DATA_FILE.write_text(json.dumps([{"date": "2024-01-01", "total": 1.0}]))
+    return app.DATA_FILE
+
+
+def test_warm_caches_fills_history_cache(history_file, monkeypatch):
+    prices = []
+    monkeypatch.setattr(app, "get_cached_prices", lambda: prices.append(1))
+
+    app.warm_caches()
+
+    assert app._history_cache[1] == [{"date": "2024-01-01", "total": 1.0}]
+    assert prices == [1]
+
+
+def test_warm_caches_swallows_errors(history_file, monkeypatch, capsys):
+    def fail():
+        raise RuntimeError("yahoo is down")
+
+    monkeypatch.setattr(app, "get_cached_prices", fail)
+
+    app.warm_caches()
+
+    assert app._history_cache[1] == [{"date": "2024-01-01", "total": 1.0}]
+    assert "Error warming caches: yahoo is down" in capsys.readouterr().out
+
+
+def test_load_history_reloads_replaced_file(history_file):
+    first = app.load_history()
+    assert app.load_history() is first
+
+    app.save_history([{"date": "2024-01-02", "total": 2.0}])
+
+    assert app.load_history() == [{"date": "2024-01-02", "total": 2.0}]
@@ -0,0 +1,230 @@
+import fcntl
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import app
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(autouse=True)
+def worker_files(tmp_path, monkeypatch):
+    """Redirect every lock and cache file to a temp directory"""
+    monkeypatch.setattr(app, "DATA_FILE", tmp_path / "portfolio_history.json")
+    monkeypatch.setattr(app, "HISTORY_LOCK_FILE", tmp_path / "portfolio_history.lock")
+    monkeypatch.setattr(app, "QUOTE_CACHE_FILE", tmp_path / "quote_cache.json")
+    monkeypatch.setattr(app, "QUOTE_LOCK_FILE", tmp_path / "quote_cache.lock")
+    monkeypatch.setattr(app, "LEADER_LOCK_FILE", tmp_path / "scheduler.lock")
+    monkeypatch.setattr(app, "QUOTE_LOCK_TIMEOUT", 0.2)
+    monkeypatch.setattr(app, "_leader_lock", None)
+    monkeypatch.setattr(app, "_history_cache", None)
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Stub out yfinance; returns the list of fetched price dicts"""
+    calls = []
+
+    def fetch_prices():
+        prices = app.empty_prices() | {"SEME": 10.0 + len(calls)}
+        calls.append(prices)
+        return prices
+
+    monkeypatch.setattr(app, "fetch_prices", fetch_prices)
+    return calls
+
+
+def hold_lock(path):
+    """Lock path through a separate open file, as another process would"""
+    f = open(path, 'a')
+    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return f
+
+
+def write_cache(prices, age):
+    app.QUOTE_CACHE_FILE.write_text(json.dumps({"fetched_at": time.time() - age, "prices": prices}))
+
+
+# file_lock / atomic_write
+
+def test_file_lock_non_blocking_when_held():
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with app.file_lock(app.QUOTE_LOCK_FILE, timeout=0):
+                pass
+        assert time.monotonic() - started < 0.1
+
+
+def test_file_lock_times_out_when_held():
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with app.file_lock(app.QUOTE_LOCK_FILE, timeout=0.3):
+                pass
+        assert time.monotonic() - started >= 0.3
+
+
+def test_file_lock_is_released():
+    with app.file_lock(app.QUOTE_LOCK_FILE, timeout=0):
+        pass
+    with app.file_lock(app.QUOTE_LOCK_FILE, timeout=0):
+        pass
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("old")
+
+    with app.atomic_write(path) as f:
+        f.write("new")
+
+    assert path.read_text() == "new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.json"]
+
+
+def test_atomic_write_cleans_up_on_error(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with app.atomic_write(path) as f:
+            f.write("partial")
+            raise RuntimeError("boom")
+
+    assert path.read_text() == "old"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.json"]
+
+
+# leader election
+
+def test_only_one_process_becomes_leader():
+    script = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "import app\n"
+        "app.LEADER_LOCK_FILE = Path(sys.argv[1])\n"
+        "print(app.try_become_leader(), flush=True)\n"
+        "sys.stdin.readline()\n"
+    )
+    leader = subprocess.Popen(
+        [sys.executable, "-c", script, str(app.LEADER_LOCK_FILE)],
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert leader.stdout.readline().strip() == "True"
+        assert app.try_become_leader() is False
+    finally:
+        leader.communicate("\n", timeout=10)
+
+    try:
+        assert app.try_become_leader() is True
+        assert app.try_become_leader() is True
+    finally:
+        app._leader_lock.close()
+
+
+# get_cached_prices / poll_quotes
+
+def test_fresh_cache_is_served_without_fetching(fetches):
+    write_cache({"SEME": 1.0}, age=0)
+
+    assert app.get_cached_prices() == {"SEME": 1.0}
+    assert fetches == []
+
+
+def test_stale_cache_is_refreshed(fetches):
+    write_cache({"SEME": 1.0}, age=app.QUOTE_CACHE_TTL + 1)
+
+    prices = app.get_cached_prices()
+
+    assert prices == fetches[0]
+    assert app.load_quote_cache()["prices"] == prices
+
+
+def test_stale_cache_is_served_while_another_worker_refreshes(fetches):
+    write_cache({"SEME": 1.0}, age=app.QUOTE_CACHE_TTL + 1)
+
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        started = time.monotonic()
+        assert app.get_cached_prices() == {"SEME": 1.0}
+        assert time.monotonic() - started < 0.1
+
+    assert fetches == []
+
+
+def test_no_cache_waits_then_returns_empty_prices(fetches):
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        assert app.get_cached_prices() == app.empty_prices()
+
+    assert fetches == []
+
+
+def test_no_cache_timeout_uses_cache_written_meanwhile(fetches, monkeypatch):
+    load_quote_cache = app.load_quote_cache
+    calls = []
+
+    def load_after_first_call():
+        # The other worker finishes its refresh just as the wait times out
+        calls.append(1)
+        if len(calls) > 1:
+            return {"fetched_at": time.time(), "prices": {"SEME": 5.0}}
+        return load_quote_cache()
+
+    monkeypatch.setattr(app, "load_quote_cache", load_after_first_call)
+
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        assert app.get_cached_prices() == {"SEME": 5.0}
+
+    assert fetches == []
+
+
+def test_poll_quotes_refreshes_cache(fetches):
+    app.poll_quotes()
+
+    assert app.load_quote_cache()["prices"] == fetches[0]
+
+
+def test_poll_quotes_skips_when_lock_is_held(fetches):
+    with hold_lock(app.QUOTE_LOCK_FILE):
+        app.poll_quotes()
+
+    assert fetches == []
+    assert app.load_quote_cache() is None
+
+
+# catch_up_daily_snapshot
+
+@pytest.fixture
+def snapshots(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "save_daily_snapshot", lambda: calls.append(1))
+    return calls
+
+
+def test_catch_up_writes_missing_snapshot_after_midnight(snapshots):
+    app.save_history([{"date": "2024-01-01", "total": 1.0}])
+
+    assert app.catch_up_daily_snapshot(datetime(2024, 1, 2, 0, 1)) is True
+    assert snapshots == [1]
+
+
+def test_catch_up_skips_existing_snapshot(snapshots):
+    app.save_history([{"date": "2024-01-02", "total": 1.0}])
+
+    assert app.catch_up_daily_snapshot(datetime(2024, 1, 2, 0, 1)) is False
+    assert snapshots == []
+
+
+def test_catch_up_skips_outside_grace_period(snapshots):
+    assert app.catch_up_daily_snapshot(datetime(2024, 1, 2, 14, 0)) is False
+    assert snapshots == []